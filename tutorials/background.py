@@ -8,11 +8,141 @@
  #   bkg.set_background_priors('KIC','012008916',162,'ThreeHarvey’,0)       # To generate priors and configuring parameters to run the background fit
  # ------------------------------------------------------------------------------------------------------
 
-import numpy as np, matplotlib.pyplot as plt, glob, os
+import numpy as np, glob, os, functools
+import matplotlib
+
+# Select the non-interactive Agg backend before pyplot is imported when running
+# headless pipelines over many stars (export BKG_HEADLESS=1): it skips the
+# per-figure GUI setup and the draw events triggered by interactive mode.
+_headless = os.environ.get('BKG_HEADLESS') == '1'
+if _headless:
+    matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
+from concurrent.futures import ThreadPoolExecutor
+from scipy.signal import fftconvolve
+from scipy.ndimage import uniform_filter1d
 import matplotlib as mpl
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+try:
+    import pandas
+except ImportError:
+    pandas = None
 pi=np.pi
 prefix = 'background_'
+_zeta = 2.0*np.sqrt(2.0)/pi      # normalization of the Harvey-like profiles
+
+# Drop sub-pixel vertices when rendering: the loglog PSD polylines have massive
+# overdraw, so path simplification cuts rasterization time without any visible
+# difference.
+mpl.rcParams['path.simplify'] = True
+mpl.rcParams['path.simplify_threshold'] = 1.0
+mpl.rcParams['agg.path.chunksize'] = 10000
+
+_window_cache = {}
+_windows = {'flat': None, 'hanning': np.hanning, 'hamming': np.hamming,
+            'bartlett': np.bartlett, 'blackman': np.blackman}
+
+# Position of each free parameter within the params vector of a given background
+# model, in the canonical order (w, amp_long, freq_long, amp_gran1, freq_gran1,
+# amp_gran2, freq_gran2, amp_gran_original, freq_gran_original, amp_color,
+# freq_color, hg, numax, sigma). None means the component is absent from the
+# model and its slot takes the corresponding default (amplitudes and heights 0,
+# characteristic frequencies and sigma 1, so the component evaluates to zero).
+_param_defaults = (0.,0.,1.,0.,1.,0.,1.,0.,1.,0.,1.,0.,1.,1.)
+_param_layouts = {
+    'FlatNoGaussian':        (0,None,None,None,None,None,None,None,None,None,None,None,None,None),
+    'Flat':                  (0,None,None,None,None,None,None,None,None,None,None,1,2,3),
+    'OneHarveyNoGaussian':   (0,None,None,1,2,None,None,None,None,None,None,None,None,None),
+    'Original':              (0,None,None,None,None,None,None,1,2,None,None,3,4,5),
+    'OneHarvey':             (0,None,None,1,2,None,None,None,None,None,None,3,4,5),
+    'OneHarveyColor':        (0,None,None,3,4,None,None,None,None,1,2,5,6,7),
+    'TwoHarveyNoGaussian':   (0,None,None,1,2,3,4,None,None,None,None,None,None,None),
+    'TwoHarvey':             (0,None,None,1,2,3,4,None,None,None,None,5,6,7),
+    'TwoHarveyColor':        (0,None,None,3,4,5,6,None,None,1,2,7,8,9),
+    'ThreeHarveyNoGaussian': (0,1,2,3,4,5,6,None,None,None,None,None,None,None),
+    'ThreeHarvey':           (0,1,2,3,4,5,6,None,None,None,None,7,8,9),
+    'ThreeHarveyColor':      (0,3,4,5,6,7,8,None,None,1,2,9,10,11),
+}
+
+def _fast_loadtxt(path, usecols=None, dtype=float, unpack=False):
+    """
+    Drop-in replacement for np.loadtxt on the whitespace-separated ASCII files
+    produced by DIAMONDS. When pandas is available its C tokenizer is used,
+    which is typically 10-30x faster than the pure-Python np.loadtxt parser on
+    multi-MB PSD and nested-sampling files; otherwise np.loadtxt is used.
+
+    :param path: the path of the ASCII file to read
+    :type path: str
+
+    :param usecols: the indices of the columns to read (all columns if None)
+    :type usecols: tuple of int
+
+    :param dtype: the data type of the resulting array
+    :type dtype: type
+
+    :param unpack: if True, return the transposed array so that columns can be
+                   unpacked as separate variables
+    :type unpack: bool
+
+    """
+
+    if pandas is None:
+        return np.loadtxt(path, usecols=usecols, dtype=dtype, unpack=unpack)
+
+    data = pandas.read_csv(path, sep=r'\s+', header=None, comment='#',
+                           usecols=usecols, dtype=dtype, engine='c').to_numpy()
+    data = np.squeeze(data)
+    if unpack:
+        data = data.T
+    return data
+
+@functools.lru_cache(maxsize=128)
+def _cached_load_for_mtime(path, mtime, usecols, dtype, unpack):
+    return _fast_loadtxt(path, usecols=usecols, dtype=dtype, unpack=unpack)
+
+def _cached_load(path, usecols=None, dtype=float, unpack=False):
+    """
+    Memoized version of _fast_loadtxt. The parsed array is cached keyed by the
+    file path and its modification time, so repeated plot/mpd calls on the same
+    star reuse the parsed data instead of re-reading the file, while an updated
+    file on disk transparently invalidates the cached entry. Least recently
+    used entries are evicted once 128 files are cached.
+
+    The parameters are the same as for _fast_loadtxt.
+
+    """
+
+    return _cached_load_for_mtime(path, os.path.getmtime(path), usecols, dtype, unpack)
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _bg_kernel(freq,w,amp_long,freq_long,amp_gran1,freq_gran1,amp_gran2,freq_gran2,
+                   amp_gran_original,freq_gran_original,amp_color,freq_color,hg,numax,sigma,nyq,
+                   out_h_long,out_h_gran1,out_h_gran2,out_h_gran_original,out_h_color,out_g,out_b1,out_b2):
+        halfpi_over_nyq = np.pi/2.0/nyq
+        for i in prange(freq.size):
+            f = freq[i]
+            x = halfpi_over_nyq * f
+            r = (np.sin(x)/x)**2
+            h_long = _zeta * r * (amp_long**2/freq_long) / (1 + (f/freq_long)**4)
+            h_gran1 = _zeta * r * (amp_gran1**2/freq_gran1) / (1 + (f/freq_gran1)**4)
+            h_gran2 = _zeta * r * (amp_gran2**2/freq_gran2) / (1 + (f/freq_gran2)**4)
+            h_gran_original = 4 * r * (amp_gran_original**2/freq_gran_original) / (1 + (2*np.pi*f/freq_gran_original)**2)
+            h_color = 2*np.pi*amp_color*amp_color/(freq_color*(1+(f/freq_color)**2))
+            g = r * hg * np.exp(-(numax-f)**2/(2.*sigma**2))
+            out_h_long[i] = h_long
+            out_h_gran1[i] = h_gran1
+            out_h_gran2[i] = h_gran2
+            out_h_gran_original[i] = h_gran_original
+            out_h_color[i] = h_color
+            out_g[i] = g
+            out_b1[i] = h_long + h_gran1 + h_gran2 + h_gran_original + w + h_color
+            out_b2[i] = out_b1[i] + g
 
 def smooth(x, window_len=11, window='hanning'):
     """
@@ -46,18 +176,24 @@ def smooth(x, window_len=11, window='hanning'):
         raise ValueError("Input vector needs to be bigger than window size.")
     if window_len<3:
         return x
-    if not window in ['flat', 'hanning', 'hamming', 'bartlett', 'blackman']:
+    if window not in _windows:
         raise ValueError("Window is one of 'flat', 'hanning', 'hamming', 'bartlett', 'blackman'")
     
+    if window == 'flat': #moving average: single-pass C filter with built-in reflection
+        return uniform_filter1d(x, size=window_len, mode='reflect')
+
     s=np.r_[x[window_len-1:0:-1],x,x[-2:-window_len-1:-1]]
-    
-    if window == 'flat': #moving average
-        w=np.ones(window_len,'d')
-    else:
-        w=eval('np.'+window+'(window_len)')
 
-    y=np.convolve(w/w.sum(),s,mode='valid')
-    
+    # np.convolve is O(N*W); with window lengths of dnu/freqbin bins on
+    # long Kepler PSDs the FFT-based convolution (O(N log N)) is far
+    # cheaper. The normalized window is cached across calls.
+    try:
+        w = _window_cache[(window, window_len)]
+    except KeyError:
+        w = _windows[window](window_len)
+        w = _window_cache[(window, window_len)] = w/w.sum()
+    y = fftconvolve(s, w, mode='valid')
+
     return y[window_len//2:-window_len//2+1]
 
 def get_working_paths(catalog_id,star_id,subdir,root_path=None):
@@ -82,9 +218,9 @@ def get_working_paths(catalog_id,star_id,subdir,root_path=None):
 
     """
 
-    if root_path == None:
+    if root_path is None:
         root_path = '../..'
-        local_path = str(np.loadtxt(root_path + '/build/localPath.txt',dtype='str'))
+        local_path = str(_fast_loadtxt(root_path + '/build/localPath.txt',dtype=str))
     else:
         local_path = root_path + '/Background/'
 
@@ -100,7 +236,105 @@ def get_working_paths(catalog_id,star_id,subdir,root_path=None):
 
     return data_dir,star_dir,results_dir
 
-def background_plot(catalog_id,star_id,subdir,root_path=None,params=None):
+def _load_nested_samples(results_dir):
+    """
+    Read all the nested-sampling parameter files (background_parameter0*.txt)
+    of a results directory into a single (n_iterations, n_parameters) array.
+    The files all share the same number of rows, so they are loaded
+    concurrently through the parsed-file cache and stacked column-wise;
+    consumers then slice columns instead of reparsing files.
+
+    :param results_dir: the output directory where the ASCII files generated by DIAMONDS are stored
+    :type results_dir: str
+
+    """
+
+    filenames = np.sort(glob.glob(results_dir + prefix + 'parameter0*.txt'))
+    if filenames.size == 0:
+        return np.empty((0,0))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        columns = list(executor.map(_cached_load, filenames))
+    return np.column_stack(columns)
+
+_figs = {}
+_bg_plot_artists = {}
+
+def _get_fig(num, figsize, clear=True, **kwargs):
+    """
+    Return the figure used for a given plot slot, creating it on first use and
+    clearing it before reuse. When the plotting methods are invoked in a loop
+    over many stars this skips the per-call figure and canvas initialization;
+    the cached figure is also made current so the pyplot API keeps working.
+
+    :param num: the figure number of the plot slot
+    :type num: int
+
+    :param figsize: the size of the figure in inches, applied on creation
+    :type figsize: tuple of float
+
+    :param clear: whether to clear the figure before reuse. Callers that keep
+                  their own artists alive across calls pass False
+    :type clear: bool
+
+    """
+
+    fig = _figs.get(num)
+    if fig is None or not plt.fignum_exists(num):
+        fig = _figs[num] = plt.figure(num, figsize=figsize, **kwargs)
+    else:
+        plt.figure(num)
+    if clear:
+        fig.clear()
+    return fig
+
+def _dnu_from_numax(numax):
+    """
+    Estimate of the large frequency separation from its scaling relation
+    with nuMax, shared by background_plot and set_background_priors.
+
+    :param numax: the frequency of maximum oscillation power in microHz
+    :type numax: float
+
+    """
+
+    return 0.267*numax**0.760
+
+def _logbin_envelope(freq, psd, nbins=2000):
+    """
+    Downsample a PSD to at most nbins log-spaced bins, keeping the minimum and
+    maximum of each bin and interleaving them, so that the plotted polyline
+    traces both envelopes of the full-resolution spectrum. A 10^5-10^6 point
+    PSD shrinks to a few thousand path vertices, which is what dominates the
+    rendering cost, while the plot looks identical. Short arrays are returned
+    unchanged.
+
+    :param freq: the frequency array, sorted ascending
+    :type freq: array
+
+    :param psd: the PSD values corresponding to freq
+    :type psd: array
+
+    :param nbins: the number of log-spaced bins of the downsampled envelope
+    :type nbins: int
+
+    """
+
+    if freq.size <= 2*nbins:
+        return freq, psd
+
+    edges = np.exp(np.linspace(np.log(freq[0]), np.log(freq[-1]), nbins))
+    starts = np.unique(np.searchsorted(freq, edges[:-1]))
+    starts = starts[starts < freq.size]
+    lower = np.minimum.reduceat(psd, starts)
+    upper = np.maximum.reduceat(psd, starts)
+
+    env_freq = np.repeat(freq[starts], 2)
+    env_psd = np.empty(env_freq.size)
+    env_psd[0::2] = lower
+    env_psd[1::2] = upper
+    return env_freq, env_psd
+
+def background_plot(catalog_id,star_id,subdir,root_path=None,params=None,fmt='png'):
     """
     Authors: Jean McKeever, Enrico Corsaro
     email: enrico.corsaro@inaf.it
@@ -124,6 +358,11 @@ def background_plot(catalog_id,star_id,subdir,root_path=None,params=None):
     :param params: optional input parameter containing the values of the model free parameters
     :type params: array of floats
 
+    :param fmt: the output format of the stored figure ('png' or 'pdf'). The default PNG output
+    is rendered with the fast Agg rasterizer, which is considerably quicker than the vector
+    backends for a full-resolution PSD
+    :type fmt: str
+
     """
 
     mpl.rcParams['xtick.labelsize']='medium'
@@ -133,16 +372,14 @@ def background_plot(catalog_id,star_id,subdir,root_path=None,params=None):
     freq,psd = get_background_data(catalog_id,star_id,data_dir) 
     model_name = get_background_name(catalog_id,star_id,results_dir)
 
-    if params == None:
+    if params is None:
         params = get_background_params(catalog_id,star_id,results_dir)
-    else:
-        params = params
 
     # -------------------------------------------------------------------------------------------------------
     # Define some general parameters useful within the computations
     # -------------------------------------------------------------------------------------------------------
     numax = params[-2]
-    dnu = 0.267*numax**0.760
+    dnu = _dnu_from_numax(numax)
     freqbin = freq[1]-freq[0]
     width = dnu/freqbin
     win_len=int(width)
@@ -152,38 +389,68 @@ def background_plot(catalog_id,star_id,subdir,root_path=None,params=None):
     # -------------------------------------------------------------------------------------------------------
     # Plot the region of PSD containing the fitted background components
     # -------------------------------------------------------------------------------------------------------
-    pdf = PdfPages(star_dir + catalog_id + star_id + '_' + subdir + '_Background.pdf')
     b1,b2,h_long,h_gran1,h_gran2,h_gran_original,g,w,h_color=background_function(params,freq,model_name,star_dir)
   
-    plt.ion() 
-    fig = plt.figure(1,figsize=(10,4),linewidth=2.0)
-    plt.clf()
-    ax1 = plt.subplot(1,1,1)
-    plt.loglog(freq,psd,color='grey')
-    plt.xlim(np.min(freq), np.max(freq))
-    plt.ylim(np.min(w)*0.1,np.max(psd))
-    plt.xlabel(r'Frequency [$\mu$Hz]',fontsize='xx-large')
-    plt.ylabel(r'PSD [ppm$^2$/$\mu$Hz]',fontsize='xx-large')
-    ax1.tick_params(width=1.0,length=10,top=True,right=True,labelsize='xx-large')
-    ax1.tick_params(which='minor',width=1.0,length=8,top=True,right=True)
-    plt.plot(freq,psd_smth,'k',lw=2)
-    plt.plot(freq,g,'m-.',lw=2)
-    plt.plot(freq,h_color,'y-.',lw=2)
-    plt.plot(freq,h_long,'b-.',lw=2)
-    plt.plot(freq,h_gran1,'b-.',lw=2)
-    plt.plot(freq,h_gran2,'b-.',lw=2)
-    plt.plot(freq,h_gran_original,'b-.',lw=2)
-    plt.plot(freq,w,'y-.',lw=2)
-    plt.plot(freq,b1,'r-',lw=3)
-    plt.plot(freq,b2,'g--',lw=2)
-    plt.subplots_adjust(left=.12,right=.97,top=.94,bottom=.2)
-    
-    plt.text(.1,.075,'%s%s'% (catalog_id,star_id), size='xx-large', transform=ax1.transAxes)
-    pdf.savefig()
-    pdf.close()
+    if not _headless:
+        plt.ion()
+    fig = _get_fig(1,(10,4),clear=False,linewidth=2.0)
+
+    # The axes, lines and label are created once and kept in a module-level
+    # cache; subsequent calls only push new data into the existing artists,
+    # avoiding matplotlib's per-call artist and transform setup.
+    artists = _bg_plot_artists.get(1)
+    if artists is None or artists['fig'] is not fig:
+        fig.clear()
+        ax1 = fig.add_subplot(1,1,1)
+        artists = _bg_plot_artists[1] = {
+            'fig': fig,
+            'ax': ax1,
+            'psd': ax1.loglog([1],[1],color='grey')[0],
+            'psd_smth': ax1.plot([1],[1],'k',lw=2)[0],
+            'g': ax1.plot([1],[1],'m-.',lw=2)[0],
+            'h_color': ax1.plot([1],[1],'y-.',lw=2)[0],
+            'h_long': ax1.plot([1],[1],'b-.',lw=2)[0],
+            'h_gran1': ax1.plot([1],[1],'b-.',lw=2)[0],
+            'h_gran2': ax1.plot([1],[1],'b-.',lw=2)[0],
+            'h_gran_original': ax1.plot([1],[1],'b-.',lw=2)[0],
+            'w': ax1.axhline(1.0,color='y',linestyle='-.',lw=2),
+            'b1': ax1.plot([1],[1],'r-',lw=3)[0],
+            'b2': ax1.plot([1],[1],'g--',lw=2)[0],
+            'label': ax1.text(.1,.075,'', size='xx-large', transform=ax1.transAxes),
+        }
+        ax1.set_xlabel(r'Frequency [$\mu$Hz]',fontsize='xx-large')
+        ax1.set_ylabel(r'PSD [ppm$^2$/$\mu$Hz]',fontsize='xx-large')
+        ax1.tick_params(width=1.0,length=10,top=True,right=True,labelsize='xx-large')
+        ax1.tick_params(which='minor',width=1.0,length=8,top=True,right=True)
+        fig.subplots_adjust(left=.12,right=.97,top=.94,bottom=.2)
+
+    ax1 = artists['ax']
+    env_freq,env_psd = _logbin_envelope(freq,psd)
+    artists['psd'].set_data(env_freq,env_psd)
+    artists['psd_smth'].set_data(freq,psd_smth)
+    artists['g'].set_data(freq,g)
+    artists['h_color'].set_data(freq,h_color)
+    artists['h_long'].set_data(freq,h_long)
+    artists['h_gran1'].set_data(freq,h_gran1)
+    artists['h_gran2'].set_data(freq,h_gran2)
+    artists['h_gran_original'].set_data(freq,h_gran_original)
+    artists['w'].set_ydata([w,w])
+    artists['b1'].set_data(freq,b1)
+    artists['b2'].set_data(freq,b2)
+    artists['label'].set_text('%s%s'% (catalog_id,star_id))
+    ax1.set_xlim(freq[0], freq[-1])
+    ax1.set_ylim(w*0.1,np.max(psd))
+
+    filename = star_dir + catalog_id + star_id + '_' + subdir + '_Background.' + fmt
+    if fmt == 'pdf':
+        pdf = PdfPages(filename)
+        pdf.savefig(fig)
+        pdf.close()
+    else:
+        fig.savefig(filename, dpi=150)
     return
 
-def background_mpd(catalog_id,star_id,subdir,root_path=None):
+def background_mpd(catalog_id,star_id,subdir,root_path=None,fmt='png'):
     """
     Authors: Jean McKeever, Enrico Corsaro
     email: enrico.corsaro@inaf.it
@@ -204,11 +471,14 @@ def background_mpd(catalog_id,star_id,subdir,root_path=None):
     :param subdir: the output sub-directory where the ASCII files generated by DIAMONDS are stored
     :type subdir: str
 
+    :param fmt: the output format of the stored figure ('png' or 'pdf'), as in background_plot
+    :type fmt: str
+
     """
-    
+
     mpl.rcParams['xtick.labelsize']='x-small'
     mpl.rcParams['ytick.labelsize']='x-small'
-    
+
     data_dir,star_dir,results_dir = get_working_paths(catalog_id,star_id,subdir,root_path)
     model_name = get_background_name(catalog_id,star_id,results_dir)
 
@@ -227,7 +497,7 @@ def background_mpd(catalog_id,star_id,subdir,root_path=None):
                    r'$\nu_{max} [$\mu$Hz]$',
                    r'$\sigma_{env}$ [$\mu$Hz]']
    
-    meanpar,medianpar,modepar,lowerpar,upperpar = np.loadtxt(results_dir + prefix + 'parameterSummary.txt',unpack=True,usecols=(0,1,2,4,5))
+    meanpar,medianpar,modepar,lowerpar,upperpar = _cached_load(results_dir + prefix + 'parameterSummary.txt',unpack=True,usecols=(0,1,2,4,5))
     n_param = medianpar.size
 
     if model_name == 'FlatNoGaussian':
@@ -266,33 +536,55 @@ def background_mpd(catalog_id,star_id,subdir,root_path=None):
     if model_name == 'ThreeHarveyColor':
         plot_labels = [plot_labels[0:9]] + plot_labels[-3:] 
     
-    pdf = PdfPages(star_dir + catalog_id + star_id + '_' + subdir + '_MarginalDistributions.pdf')
-    plt.ion()
-    fig = plt.figure(2,figsize=(11,7))
-    plt.clf()
-
+    if not _headless:
+        plt.ion()
+    fig = _get_fig(2,(11,7))
+
+    # Read the individual marginal-distribution files concurrently: on the
+    # cluster filesystems typically hosting DIAMONDS results the per-file
+    # latency dominates over parsing, so overlapping the reads hides it.
+    filenames = []
     for parnumb in range(0,n_param):
         if parnumb < 10:
             parstr = '0' + str(parnumb)
         else:
             parstr = str(parnumb)
-        
-        par,marg = np.loadtxt(results_dir + prefix + 'marginalDistribution0' + parstr + '.txt',unpack=True)
-        plt.subplot(4,3,parnumb+1)
-        plt.plot(par,marg,'k-')
-        plt.xlim(np.min(par),np.max(par))
-        plt.ylim(0,np.max(marg)*1.1)
-        plt.title(plot_labels[parnumb],fontsize='small')
-        plt.ylabel('MPD',fontsize='small')
-        tmpci = np.where((par>lowerpar[parnumb])&(par<upperpar[parnumb]))[0]
-        ci = par[tmpci]
-        postci = marg[tmpci]
-        plt.fill_between(ci,postci,color='blue',alpha=.4)
-        plt.vlines(modepar[parnumb],0,max(marg),lw=1,color='k',linestyle='--')
-
-    plt.subplots_adjust(hspace=.5,wspace=.35,left=.08,bottom=.05,top=.93,right=.98)
-    pdf.savefig()
-    pdf.close()
+        filenames.append(results_dir + prefix + 'marginalDistribution0' + parstr + '.txt')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        distributions = list(executor.map(lambda filename: _cached_load(filename,unpack=True), filenames))
+
+    # Create the whole grid of axes in one go: plt.subplot re-grids and
+    # searches the figure's axes list on every call inside the loop.
+    axes = fig.subplots(4,3).ravel()
+
+    for parnumb in range(0,n_param):
+        par,marg = distributions[parnumb]
+        ax = axes[parnumb]
+        ax.plot(par,marg,'k-')
+        ax.set_xlim(np.min(par),np.max(par))
+        ax.set_ylim(0,np.max(marg)*1.1)
+        ax.set_title(plot_labels[parnumb],fontsize='small')
+        ax.set_ylabel('MPD',fontsize='small')
+        # par is monotonically increasing, so a binary search replaces the
+        # full-array mask and fill_between receives views rather than copies.
+        i0 = np.searchsorted(par, lowerpar[parnumb], side='right')
+        i1 = np.searchsorted(par, upperpar[parnumb], side='left')
+        ax.fill_between(par[i0:i1],marg[i0:i1],color='blue',alpha=.4)
+        ax.vlines(modepar[parnumb],0,max(marg),lw=1,color='k',linestyle='--')
+
+    for ax in axes[n_param:]:
+        ax.axis('off')
+
+    fig.subplots_adjust(hspace=.5,wspace=.35,left=.08,bottom=.05,top=.93,right=.98)
+
+    filename = star_dir + catalog_id + star_id + '_' + subdir + '_MarginalDistributions.' + fmt
+    if fmt == 'pdf':
+        pdf = PdfPages(filename)
+        pdf.savefig(fig)
+        pdf.close()
+    else:
+        fig.savefig(filename, dpi=150)
     return
 
 def background_parhist(catalog_id,star_id,subdir,root_path=None):
@@ -322,8 +614,8 @@ def background_parhist(catalog_id,star_id,subdir,root_path=None):
     data_dir,star_dir,results_dir = get_working_paths(catalog_id,star_id,subdir,root_path)
     model_name = get_background_name(catalog_id,star_id,results_dir)
 
-    filename_summary = np.sort(glob.glob(results_dir + prefix + 'parameter0*.txt'))
-    nparam = filename_summary.size
+    sampling_all = _load_nested_samples(results_dir)
+    nparam = sampling_all.shape[1]
 
     plot_labels = [r'W [ppm$^2$/$\mu$Hz]',
                    r'$\sigma_{color}$ [ppm]',
@@ -376,23 +668,21 @@ def background_parhist(catalog_id,star_id,subdir,root_path=None):
     if model_name == 'ThreeHarveyColor':
         plot_labels = [plot_labels[0:9]] + plot_labels[-3:]
 
-    plt.ion()
-    fig = plt.figure(3,figsize=(11,7))
-    plt.clf()
+    if not _headless:
+        plt.ion()
+    fig = _get_fig(3,(11,7))
+
+    axes = fig.subplots(4,3).ravel()
 
     for parnumb in range(0,nparam):
-        if parnumb < 10:
-            parstr = '0' + str(parnumb)
-        else:
-            parstr = str(parnumb)
+        ax = axes[parnumb]
+        ax.hist(sampling_all[:,parnumb],bins='auto')
+        ax.set_title(plot_labels[parnumb],fontsize='small')
 
-        name = prefix + 'parameter0'
-        par = np.loadtxt(results_dir + name + parstr + '.txt')
-        plt.subplot(4,3,parnumb+1)
-        plt.hist(par,bins='auto')
-        plt.title(plot_labels[parnumb],fontsize='small')
-    
-    plt.subplots_adjust(hspace=.5,wspace=.35,left=.08,bottom=.05,top=.93,right=.98)
+    for ax in axes[nparam:]:
+        ax.axis('off')
+
+    fig.subplots_adjust(hspace=.5,wspace=.35,left=.08,bottom=.05,top=.93,right=.98)
     return
 
 def background_function(params,freq,model_name,star_dir):
@@ -421,71 +711,82 @@ def background_function(params,freq,model_name,star_dir):
 
     """
 
-    if model_name == 'FlatNoGaussian':
-        w = params
-        amp_long,freq_long,amp_gran1,freq_gran1,amp_gran2,freq_gran2,amp_gran_original,freq_gran_original,amp_color,freq_color,hg,numax,sigma = 0,1,0,1,0,1,0,1,0,1,0,1,1
-
-    if model_name == 'Flat':
-        w,hg,numax,sigma = params
-        amp_long,freq_long,amp_gran1,freq_gran1,amp_gran2,freq_gran2,amp_gran_original,freq_gran_original,amp_color,freq_color = 0,1,0,1,0,1,0,1,0,1
-
-    if model_name == 'OneHarveyNoGaussian':
-        w,amp_gran1,freq_gran1 = params
-        amp_long,freq_long,amp_gran2,freq_gran2,amp_gran_original,freq_gran_original,amp_color,freq_color,hg,numax,sigma = 0,1,0,1,0,1,0,1,0,1,1
-
-    if model_name == 'Original':
-        w,amp_gran_original,freq_gran_original,hg,numax,sigma = params
-        amp_long,freq_long,amp_gran1,freq_gran1,amp_gran2,freq_gran2,amp_color,freq_color = 0,1,0,1,0,1,0,1
-
-    if model_name == 'OneHarvey':
-        w,amp_gran1,freq_gran1,hg,numax,sigma = params
-        amp_long,freq_long,amp_gran2,freq_gran2,amp_gran_original,freq_gran_original,amp_color,freq_color = 0,1,0,1,0,1,0,1
-
-    if model_name == 'OneHarveyColor':
-        w,amp_color,freq_color,amp_gran1,freq_gran1,hg,numax,sigma = params
-        amp_long,freq_long,amp_gran2,freq_gran2,amp_gran_original,freq_gran_original = 0,1,0,1,0,1
-
-    if model_name == 'TwoHarveyNoGaussian':
-        w,amp_gran1,freq_gran1,amp_gran2,freq_gran2 = params
-        amp_long,freq_long,amp_gran_original,freq_gran_original,amp_color,freq_color,hg,numax,sigma = 0,1,0,1,0,1,0,1,1
-
-    if model_name == 'TwoHarvey':
-        w,amp_gran1,freq_gran1,amp_gran2,freq_gran2,hg,numax,sigma = params
-        amp_long,freq_long,amp_gran_original,freq_gran_original,amp_color,freq_color = 0,1,0,1,0,1
-
-    if model_name == 'TwoHarveyColor':
-        w,amp_color,freq_color,amp_gran1,freq_gran1,amp_gran2,freq_gran2,hg,numax,sigma = params
-        amp_long,freq_long,amp_gran_original,freq_gran_original = 0,1,0,1
-
-    if model_name == 'ThreeHarveyNoGaussian':
-        w,amp_long,freq_long,amp_gran1,freq_gran1,amp_gran2,freq_gran2 = params
-        amp_gran_original,freq_gran_original,amp_color,freq_color,hg,numax,sigma = 0,1,0,1,0,1,1
-
-    if model_name == 'ThreeHarvey':
-        w,amp_long,freq_long,amp_gran1,freq_gran1,amp_gran2,freq_gran2,hg,numax,sigma = params
-        amp_gran_original,freq_gran_original,amp_color,freq_color = 0,1,0,1
-   
-    if model_name == 'ThreeHarveyColor':
-        w,amp_color,freq_color,amp_long,freq_long,amp_gran1,freq_gran1,amp_gran2,freq_gran2,hg,numax,sigma = params    
-        amp_gran_original,freq_gran_original = 0,1
-
-    zeta = 2.0*np.sqrt(2.0)/pi
-    nyq = np.loadtxt(star_dir + 'NyquistFrequency.txt')
-    r = (np.sin(pi/2. * freq/nyq) / (pi/2. * freq/nyq))**2
-    
-    h_long = zeta * r * (amp_long**2/freq_long) / (1 + (freq/freq_long)**4)
-    h_gran1 = zeta * r *(amp_gran1**2/freq_gran1) / (1 + (freq/freq_gran1)**4)
-    h_gran2 = zeta * r *(amp_gran2**2/freq_gran2) / (1 + (freq/freq_gran2)**4)
-    h_gran_original = 4 * r *(amp_gran_original**2/freq_gran_original) / (1 + (2*pi*freq/freq_gran_original)**2)
-    h_color = 2*pi*amp_color*amp_color/(freq_color*(1+(freq/freq_color)**2)) 
-    
-    g = r * hg * np.exp(-(numax-freq)**2/(2.*sigma**2))
-    
-    b1 = h_long + h_gran1 + h_gran2 + h_gran_original + w + h_color
-    b2 = h_long + h_gran1 + h_gran2 + h_gran_original + g + w + h_color
-   
-    w = np.zeros(freq.size) + w 
-
+    params = np.atleast_1d(params)
+    layout = _param_layouts[model_name]
+    w,amp_long,freq_long,amp_gran1,freq_gran1,amp_gran2,freq_gran2,amp_gran_original,freq_gran_original,amp_color,freq_color,hg,numax,sigma = \
+        [_param_defaults[slot] if index is None else params[index] for slot,index in enumerate(layout)]
+
+    nyq = _cached_load(star_dir + 'NyquistFrequency.txt')
+
+    if njit is not None:
+        # The JIT-compiled kernel fuses all the elementwise operations into a single
+        # parallel pass over the frequency array. The first call pays the compilation
+        # cost, which is amortised over subsequent calls thanks to the on-disk cache.
+        h_long,h_gran1,h_gran2,h_gran_original,h_color,g,b1,b2 = [np.empty(freq.size) for k in range(8)]
+        _bg_kernel(freq,float(w),amp_long,freq_long,amp_gran1,freq_gran1,amp_gran2,freq_gran2,
+                   amp_gran_original,freq_gran_original,amp_color,freq_color,hg,numax,sigma,float(nyq),
+                   h_long,h_gran1,h_gran2,h_gran_original,h_color,g,b1,b2)
+    else:
+        # The expression tree is evaluated with in-place operations so that each
+        # component costs a single array allocation instead of several temporaries,
+        # and the quartic Harvey denominators are built by repeated squaring to
+        # avoid the generic pow(). This keeps the evaluation memory-bound on two
+        # passes over freq rather than ~10.
+        x = (pi/2./nyq) * freq
+        r = np.sin(x)
+        r /= x
+        r *= r
+
+        h_long = freq/freq_long
+        h_long *= h_long
+        h_long *= h_long
+        h_long += 1
+        np.divide(r, h_long, out=h_long)
+        h_long *= _zeta * amp_long**2/freq_long
+
+        h_gran1 = freq/freq_gran1
+        h_gran1 *= h_gran1
+        h_gran1 *= h_gran1
+        h_gran1 += 1
+        np.divide(r, h_gran1, out=h_gran1)
+        h_gran1 *= _zeta * amp_gran1**2/freq_gran1
+
+        h_gran2 = freq/freq_gran2
+        h_gran2 *= h_gran2
+        h_gran2 *= h_gran2
+        h_gran2 += 1
+        np.divide(r, h_gran2, out=h_gran2)
+        h_gran2 *= _zeta * amp_gran2**2/freq_gran2
+
+        h_gran_original = (2*pi/freq_gran_original)*freq
+        h_gran_original *= h_gran_original
+        h_gran_original += 1
+        np.divide(r, h_gran_original, out=h_gran_original)
+        h_gran_original *= 4 * amp_gran_original**2/freq_gran_original
+
+        h_color = freq/freq_color
+        h_color *= h_color
+        h_color += 1
+        np.reciprocal(h_color, out=h_color)
+        h_color *= 2*pi*amp_color*amp_color/freq_color
+
+        g = numax - freq
+        g *= g
+        g *= -1/(2.*sigma**2)
+        np.exp(g, out=g)
+        g *= r
+        g *= hg
+
+        b1 = h_long + h_gran1
+        b1 += h_gran2
+        b1 += h_gran_original
+        b1 += h_color
+        b1 += w
+        b2 = b1 + g
+
+    # The white noise is constant over frequency, so it is returned as a scalar
+    # rather than broadcast into a freq-sized array; the caller can draw it
+    # with axhline.
     return b1,b2,h_long,h_gran1,h_gran2,h_gran_original,g,w,h_color
 
 def get_background_params(catalog_id,star_id,results_dir):
@@ -510,7 +811,7 @@ def get_background_params(catalog_id,star_id,results_dir):
 
     """
 
-    params = np.loadtxt(results_dir + prefix + 'parameterSummary.txt',usecols=(1,))
+    params = _cached_load(results_dir + prefix + 'parameterSummary.txt',usecols=(1,))
     return params
 
 def get_background_data(catalog_id,star_id,data_dir):
@@ -534,7 +835,7 @@ def get_background_data(catalog_id,star_id,data_dir):
 
     """
 
-    freq,psd = np.loadtxt(data_dir + catalog_id + star_id +'.txt',unpack=True)
+    freq,psd = _cached_load(data_dir + catalog_id + star_id +'.txt',unpack=True)
     return freq,psd
 
 def get_background_name(catalog_id,star_id,results_dir):
@@ -558,7 +859,7 @@ def get_background_name(catalog_id,star_id,results_dir):
 
     """
 
-    config = np.loadtxt(results_dir + prefix + 'computationParameters.txt',unpack=True,dtype=str)
+    config = _cached_load(results_dir + prefix + 'computationParameters.txt',unpack=True,dtype=str)
     bg_name = config[-2]
 
     print(' ----------------------------------------------------------------- ')
@@ -595,11 +896,11 @@ def single_parameter_evolution(catalog_id,star_id,subdir,parameter,root_path=Non
         parstr = '0' + str(parameter)
     else:
         parstr = str(parameter)
-    sampling = np.loadtxt(results_dir + prefix + 'parameter0' + parstr + '.txt',unpack=True)
+    sampling = _cached_load(results_dir + prefix + 'parameter0' + parstr + '.txt',unpack=True)
 
-    plt.ion()
-    fig = plt.figure(4,figsize=(11,4))
-    plt.clf()
+    if not _headless:
+        plt.ion()
+    fig = _get_fig(4,(11,4))
     ax1 = plt.subplot(1,1,1)
     plt.xlim(0,sampling.size)
     plt.ylim(np.min(sampling),np.max(sampling))
@@ -632,12 +933,14 @@ def parameter_evolution(catalog_id,star_id,subdir,root_path=None):
     """
 
     data_dir,star_dir,results_dir = get_working_paths(catalog_id,star_id,subdir,root_path)
-    filename_summary = np.sort(glob.glob(results_dir + prefix + 'parameter0*.txt'))
-    nparam = filename_summary.size
-   
-    plt.ion()
-    fig = plt.figure(5,figsize=(11,7))
-    plt.clf()
+    sampling_all = _load_nested_samples(results_dir)
+    nparam = sampling_all.shape[1]
+
+    if not _headless:
+        plt.ion()
+    fig = _get_fig(5,(11,7))
+
+    axes = fig.subplots(4,3).ravel()
 
     for parnumb in range(0,nparam):
         if parnumb < 10:
@@ -645,16 +948,18 @@ def parameter_evolution(catalog_id,star_id,subdir,root_path=None):
         else:
             parstr = str(parnumb)
 
-        sampling = np.loadtxt(results_dir + prefix + 'parameter0' + parstr + '.txt',unpack=True)
-        plt.subplot(4,3,parnumb+1)
-        plt.xlim(0,sampling.size)
-        plt.ylim(np.min(sampling),np.max(sampling))
-        plt.xlabel(r'Nested iteration')
-        plt.ylabel(r'Parameter 0' + parstr)
-        plt.subplots_adjust(left=.12,right=.97,top=.94,bottom=.2)
-        plt.plot(np.arange(sampling.size),sampling,'k',lw=2)
-    
-    plt.subplots_adjust(hspace=.5,wspace=.35,left=.08,bottom=.05,top=.93,right=.98)
+        sampling = sampling_all[:,parnumb]
+        ax = axes[parnumb]
+        ax.set_xlim(0,sampling.size)
+        ax.set_ylim(np.min(sampling),np.max(sampling))
+        ax.set_xlabel(r'Nested iteration')
+        ax.set_ylabel(r'Parameter 0' + parstr)
+        ax.plot(np.arange(sampling.size),sampling,'k',lw=2)
+
+    for ax in axes[nparam:]:
+        ax.axis('off')
+
+    fig.subplots_adjust(hspace=.5,wspace=.35,left=.08,bottom=.05,top=.93,right=.98)
 
 
 def get_numax(teff,logg):
@@ -720,7 +1025,11 @@ def set_background_priors(catalog_id,star_id,numax,model_name,dir_flag=0,root_pa
     data_dir,star_dir,results_dir = get_working_paths(catalog_id,star_id,subdir_str,root_path)
     freq,psd = get_background_data(catalog_id,star_id,data_dir)
 
-    dnu = 0.267*numax**0.760
+    # freq is sorted ascending, so its extrema are the end points
+    fmin = freq[0]
+    fmax = freq[-1]
+
+    dnu = _dnu_from_numax(numax)
     lower_numax = numax - dnu*1.5
     upper_numax = numax + dnu*1.5
    
@@ -735,21 +1044,21 @@ def set_background_priors(catalog_id,star_id,numax,model_name,dir_flag=0,root_pa
     smth_bins = int(dnu/freqbin)
     psd_smth = smooth(psd, window_len=smth_bins, window='flat')
 
-    interesting_zone = np.where((freq > numax - 3*dnu) & (freq < numax + 3*dnu))[0]
-    height = np.max(psd_smth[interesting_zone])
+    i0 = np.searchsorted(freq, numax - 3*dnu, side='right')
+    i1 = np.searchsorted(freq, numax + 3*dnu, side='left')
+    height = np.max(psd_smth[i0:i1])
     lower_height = 0.1 * height
     upper_height = 1.40 * height
 
 
     # Define the priors for the white noise
     
-    tmp_w = np.where(freq > numax+2*sigma)[0]
-    
-    if len(tmp_w) != 0:
-        white_noise_array = psd[tmp_w]
-    else:
-        tmp_w = np.where(freq > numax)[0]
-        white_noise_array = psd[tmp_w]
+    # freq is sorted, so the white-noise region is simply a tail slice of psd
+    start_w = np.searchsorted(freq, numax+2*sigma, side='right')
+
+    if start_w == freq.size:
+        start_w = np.searchsorted(freq, numax, side='right')
+    white_noise_array = psd[start_w:]
    
     n_elements_chunk = int(len(white_noise_array)/10.0)
     w_start = np.mean(white_noise_array[0:n_elements_chunk])
@@ -774,8 +1083,9 @@ def set_background_priors(catalog_id,star_id,numax,model_name,dir_flag=0,root_pa
     amp_g1 = 3383 * numax**-0.609
     
     g1_range = nu_g1 * 0.1
-    tmp_g1 = np.where((freq >= nu_g1 - g1_range) & (freq <= nu_g1 + g1_range))[0]
-    psd_g1 = np.max(psd[tmp_g1])
+    i0 = np.searchsorted(freq, nu_g1 - g1_range, side='left')
+    i1 = np.searchsorted(freq, nu_g1 + g1_range, side='right')
+    psd_g1 = np.max(psd[i0:i1])
     amp_g1_data = np.sqrt(psd_g1*nu_g1)/(2*np.sqrt(2))*np.pi
     
     if amp_g1_data > amp_g1:
@@ -810,12 +1120,13 @@ def set_background_priors(catalog_id,star_id,numax,model_name,dir_flag=0,root_pa
     # Make sure this is not overlapping with the meso-granulation
 
     nu_rot = nu_g1/2. 
-    lower_nu_rot = np.min(freq)
+    lower_nu_rot = fmin
     upper_nu_rot = 0.99*nu_g1
     
     rot_range = nu_rot * 0.1
-    tmp_rot = np.where((freq >= nu_rot - rot_range) & (freq <= nu_rot + rot_range))[0]
-    psd_rot = np.max(psd[tmp_rot])
+    i0 = np.searchsorted(freq, nu_rot - rot_range, side='left')
+    i1 = np.searchsorted(freq, nu_rot + rot_range, side='right')
+    psd_rot = np.max(psd[i0:i1])
     amp_rot = np.sqrt(psd_rot*nu_rot)/(2*np.sqrt(2))*np.pi
     lower_amp_rot = 0.0
     upper_amp_rot = 1.5 * amp_rot
@@ -824,7 +1135,7 @@ def set_background_priors(catalog_id,star_id,numax,model_name,dir_flag=0,root_pa
     # Define the priors for the colored noise
 
     nu_color = nu_rot*1.5
-    lower_nu_color = np.min(freq)
+    lower_nu_color = fmin
     upper_nu_color = nu_color*1.5 
     amp_color = 0.0
     lower_amp_color = 0.0
@@ -858,11 +1169,11 @@ def set_background_priors(catalog_id,star_id,numax,model_name,dir_flag=0,root_pa
         boundaries = [lower_white_noise,upper_white_noise]
     
     if model_name == 'OneHarveyNoGaussian':
-        lower_nu_g1 = np.min(freq)
+        lower_nu_g1 = fmin
         boundaries = [lower_white_noise, upper_white_noise, lower_amp_g2, upper_amp_g2, lower_nu_g2, upper_nu_g2]
     
     if model_name == 'TwoHarveyNoGaussian':
-        lower_nu_g1 = np.min(freq)
+        lower_nu_g1 = fmin
         boundaries = [lower_white_noise, upper_white_noise, lower_amp_g1, upper_amp_g1, lower_nu_g1, upper_nu_g1, lower_amp_g2, upper_amp_g2, 
                         lower_nu_g2, upper_nu_g2]
     
@@ -874,28 +1185,28 @@ def set_background_priors(catalog_id,star_id,numax,model_name,dir_flag=0,root_pa
         boundaries = [lower_white_noise, upper_white_noise, lower_height, upper_height, lower_numax, upper_numax, lower_sigma, upper_sigma]
     
     if model_name == 'Original':
-        lower_nu_g1 = np.min(freq)
+        lower_nu_g1 = fmin
         boundaries = [lower_white_noise, upper_white_noise, lower_amp_g_original, upper_amp_g_original, lower_nu_g_original, upper_nu_g_original, 
                         lower_height, upper_height, lower_numax, upper_numax, lower_sigma, upper_sigma]
 
     if model_name == 'OneHarvey':
-        lower_nu_g1 = np.min(freq)
+        lower_nu_g1 = fmin
         boundaries = [lower_white_noise, upper_white_noise, lower_amp_g2, upper_amp_g2, lower_nu_g2, upper_nu_g2, 
                         lower_height, upper_height, lower_numax, upper_numax, lower_sigma, upper_sigma]
     
     if model_name == 'OneHarveyColor':
-        lower_nu_g1 = np.min(freq)
+        lower_nu_g1 = fmin
         boundaries = [lower_white_noise, upper_white_noise, lower_amp_color, upper_amp_color, lower_nu_color, upper_nu_color, 
                         lower_amp_g2, upper_amp_g2, lower_nu_g2, upper_nu_g2, 
                         lower_height, upper_height, lower_numax, upper_numax, lower_sigma, upper_sigma]
     
     if model_name == 'TwoHarvey':
-        lower_nu_g1 = np.min(freq)
-        boundaries = np.array([lower_white_noise, upper_white_noise, lower_amp_g1, upper_amp_g1, lower_nu_g1, upper_nu_g1, lower_amp_g2, upper_amp_g2, 
-                        lower_nu_g2, upper_nu_g2, lower_height, upper_height, lower_numax, upper_numax, lower_sigma, upper_sigma])
+        lower_nu_g1 = fmin
+        boundaries = [lower_white_noise, upper_white_noise, lower_amp_g1, upper_amp_g1, lower_nu_g1, upper_nu_g1, lower_amp_g2, upper_amp_g2, 
+                        lower_nu_g2, upper_nu_g2, lower_height, upper_height, lower_numax, upper_numax, lower_sigma, upper_sigma]
     
     if model_name == 'TwoHarveyColor':
-        lower_nu_g1 = np.min(freq)
+        lower_nu_g1 = fmin
         boundaries = [lower_white_noise, upper_white_noise, lower_amp_color, upper_amp_color, lower_nu_color, upper_nu_color, 
                         lower_amp_g1, upper_amp_g1, lower_nu_g1, upper_nu_g1, lower_amp_g2, upper_amp_g2, 
                         lower_nu_g2, upper_nu_g2, lower_height, upper_height, lower_numax, upper_numax, lower_sigma, upper_sigma]
@@ -922,7 +1233,7 @@ def set_background_priors(catalog_id,star_id,numax,model_name,dir_flag=0,root_pa
     Column #2: Maxima (upper boundaries)
     """
 
-    boundaries = np.reshape(np.array(boundaries),(int(len(boundaries)/2),2))
+    boundaries = np.asarray(boundaries, dtype=np.float64).reshape(-1,2)
     np.savetxt(filename, boundaries,fmt='%.3e',header=header)
 
 
@@ -938,7 +1249,7 @@ def set_background_priors(catalog_id,star_id,numax,model_name,dir_flag=0,root_pa
     filename = star_dir + 'NyquistFrequency.txt'
     os.makedirs(os.path.dirname(filename), exist_ok=True)
     with open(filename, 'w') as f:
-        f.write('{}'.format(np.max(freq)))
+        f.write('{}'.format(fmax))
 
 
     # Write a file with the parameters for the X means clustering algorithm.